@@ -1,5 +1,9 @@
 from flask import Flask
 from .db import init_db
+from .logs import init_logging
+from .admission import init_admission
+from .json_provider import MongoJSONProvider
+from .quality import DEFAULT_THRESHOLDS
 from dotenv import load_dotenv
 from flask_jwt_extended import JWTManager 
 import os
@@ -8,12 +12,36 @@ def create_app():
     load_dotenv()
     
     app = Flask(__name__)
+    app.json = MongoJSONProvider(app)
     
     app.config["MONGO_URI"] = os.getenv("MONGO_URI", "mongodb://localhost:27017/healthguard")
     app.config["UPLOAD_FOLDER"] = "./uploads"
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
+    app.config["QUALITY_GATE_ENABLED"] = os.getenv("QUALITY_GATE_ENABLED", "true").lower() == "true"
+    app.config["QUALITY_GATE_BUDGET_MS"] = float(os.getenv("QUALITY_GATE_BUDGET_MS", "30"))
+    app.config["QUALITY_GATE_THRESHOLDS"] = {
+        name: float(os.getenv(f"QUALITY_GATE_{name.upper()}", default))
+        for name, default in DEFAULT_THRESHOLDS.items()
+    }
+    # Par modèle : un interpréteur n'exécute qu'une inférence à la fois
+    app.config["PREDICT_MAX_CONCURRENCY"] = int(os.getenv("PREDICT_MAX_CONCURRENCY", "1"))
+    app.config["PREDICT_MAX_QUEUE"] = int(os.getenv("PREDICT_MAX_QUEUE", "16"))
+    app.config["PREDICT_MAX_QUEUE_TIME"] = float(os.getenv("PREDICT_MAX_QUEUE_TIME", "5"))
+    app.config["PREDICT_RATE_PER_MINUTE"] = float(os.getenv("PREDICT_RATE_PER_MINUTE", "20"))
+    app.config["PREDICT_RATE_BURST"] = int(os.getenv("PREDICT_RATE_BURST", "5"))
+    app.config["PROFILING_ENABLED"] = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    app.config["PROFILING_TOKEN"] = os.getenv("PROFILING_TOKEN")
+    app.config["PROFILING_SAMPLE_RATE"] = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    app.config["PROFILING_INTERVAL_MS"] = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+    app.config["PROFILING_DIR"] = os.getenv("PROFILING_DIR", "./profiles")
+    app.config["LOG_LEVEL"] = os.getenv("LOG_LEVEL", "INFO").upper()
+    app.config["LOG_QUEUE_SIZE"] = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    app.config["LOG_SAMPLE_RATE"] = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+    init_logging(app)
 
     init_db(app)
+    init_admission(app)
 
     jwt = JWTManager(app)
 
@@ -0,0 +1,183 @@
+"""
+Contrôle d'admission pour l'inférence de Health Guard
+- File d'attente bornée devant chaque modèle (concurrence et temps d'attente limités)
+- Limiteur de débit par utilisateur (seau à jetons, clé = identité JWT)
+Les requêtes refusées échouent immédiatement au lieu de s'accumuler dans le serveur.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Levée quand une requête ne peut pas être admise ; retry_after en secondes"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limite le nombre d'inférences simultanées par modèle et la durée d'attente d'une place.
+    Chaque interpréteur est protégé par un verrou : au-delà d'une place par modèle,
+    les requêtes attendraient ce verrou sans délai maximal au lieu d'attendre ici.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_queue_time: float):
+        """
+        Args:
+            max_concurrency: Nombre maximal d'inférences simultanées par modèle
+            max_queue: Nombre maximal de requêtes en attente d'une place (tous modèles)
+            max_queue_time: Durée d'attente maximale des places d'une requête (secondes)
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.max_queue_time))
+
+    def _semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._slots:
+                self._slots[model] = threading.BoundedSemaphore(self.max_concurrency)
+            return self._slots[model]
+
+    def _acquire(self, semaphore: threading.BoundedSemaphore, deadline: float):
+        # Chemin rapide : place libre, pas d'attente
+        if semaphore.acquire(blocking=False):
+            return
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise Overloaded("Serveur surchargé, file d'attente pleine", self._retry_after())
+            self._waiting += 1
+        try:
+            acquired = semaphore.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise Overloaded("Serveur surchargé, délai d'attente dépassé", self._retry_after())
+
+    @contextmanager
+    def slot(self, models):
+        """
+        Réserve une place sur chacun des modèles pour la durée du bloc
+
+        Args:
+            models: Types d'analyse exécutés par la requête
+
+        Raises:
+            Overloaded: File pleine ou délai d'attente dépassé
+        """
+        # Ordre fixe pour que deux requêtes multi-modèles ne s'interbloquent pas
+        deadline = time.monotonic() + self.max_queue_time
+        acquired = []
+        try:
+            for model in sorted(set(models)):
+                semaphore = self._semaphore(model)
+                self._acquire(semaphore, deadline)
+                acquired.append(semaphore)
+            yield
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+    def stats(self) -> dict:
+        """Retourne l'occupation courante de la file"""
+        with self._lock:
+            waiting = self._waiting
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'waiting': waiting,
+        }
+
+
+class RateLimiter:
+    """
+    Seau à jetons par identité : 'burst' requêtes immédiates, puis 'rate' par seconde
+    """
+
+    # Nombre d'appels entre deux purges des seaux inactifs
+    PURGE_EVERY = 1000
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Args:
+            rate: Jetons régénérés par seconde
+            burst: Capacité du seau
+        """
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def consume(self, identity: str, cost: int = 1):
+        """
+        Consomme 'cost' jetons pour l'identité donnée (un par modèle exécuté) ;
+        le coût est plafonné à la capacité du seau pour rester satisfaisable
+
+        Raises:
+            Overloaded: Pas assez de jetons disponibles
+        """
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(identity, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+            if tokens < cost:
+                self._buckets[identity] = (tokens, now)
+                retry_after = max(1, math.ceil((cost - tokens) / self.rate))
+                raise Overloaded("Trop de requêtes, veuillez patienter", retry_after)
+
+            self._buckets[identity] = (tokens - cost, now)
+
+            self._calls += 1
+            if self._calls >= self.PURGE_EVERY:
+                self._purge(now)
+
+    def _purge(self, now: float):
+        """Supprime les seaux redevenus pleins (identités inactives)"""
+        self._calls = 0
+        refill_time = self.burst / self.rate
+        self._buckets = {
+            identity: (tokens, last)
+            for identity, (tokens, last) in self._buckets.items()
+            if now - last < refill_time
+        }
+
+
+# Instances globales initialisées par create_app
+controller = None
+rate_limiter = None
+
+
+def init_admission(app):
+    global controller, rate_limiter
+
+    # Une configuration nulle bloquerait toutes les requêtes (ou diviserait par zéro)
+    if app.config["PREDICT_MAX_CONCURRENCY"] < 1:
+        raise ValueError("PREDICT_MAX_CONCURRENCY doit être supérieur ou égal à 1")
+    if app.config["PREDICT_RATE_PER_MINUTE"] <= 0:
+        raise ValueError("PREDICT_RATE_PER_MINUTE doit être strictement positif")
+    if app.config["PREDICT_RATE_BURST"] < 1:
+        raise ValueError("PREDICT_RATE_BURST doit être supérieur ou égal à 1")
+
+    controller = AdmissionController(
+        max_concurrency=app.config["PREDICT_MAX_CONCURRENCY"],
+        max_queue=app.config["PREDICT_MAX_QUEUE"],
+        max_queue_time=app.config["PREDICT_MAX_QUEUE_TIME"],
+    )
+    rate_limiter = RateLimiter(
+        rate=app.config["PREDICT_RATE_PER_MINUTE"] / 60.0,
+        burst=app.config["PREDICT_RATE_BURST"],
+    )
@@ -1,24 +1,55 @@
 from flask_pymongo import PyMongo
-from pymongo import ASCENDING
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 from bson import ObjectId
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timezone
+import logging
+import re
+
+logger = logging.getLogger(__name__)
 
 mongo = PyMongo()
 
-def _serialize_datetime(value):
-    """Convertit un datetime ou tout objet date en string ISO."""
-    if isinstance(value, datetime):
-        return value.isoformat()
-    if isinstance(value, str):
-        return value
-    return str(value)
+HISTORY_VALIDATOR = {
+    "$jsonSchema": {
+        "bsonType": "object",
+        "required": ["patient_id", "type", "created_at"],
+        "properties": {
+            "patient_id": {
+                "bsonType": "objectId"
+            },
+            "type": {
+                "enum": ["eye", "skin", "nail"]
+            },
+            "message": {
+                "bsonType": "string"
+            },
+            "hb_level": {
+                "bsonType": "string"
+            },
+            "hb_value": {
+                "bsonType": ["double", "null"]
+            },
+            "model_version": {
+                "bsonType": ["string", "null"]
+            },
+            "created_at": {
+                "bsonType": "date"
+            }
+        }
+    }
+}
+
+# Unités de regroupement acceptées par $dateTrunc pour les tendances
+TREND_UNITS = ["day", "week", "month", "year"]
+
+_HB_LEVEL_PATTERN = re.compile(r"^\s*(-?\d+(?:\.\d+)?)")
 
 def init_db(app):
     mongo.init_app(app)
     
     if mongo.db.command("ping"):
-        print("MongoDB connecte avec succes")
+        logger.info("MongoDB connecté avec succès")
 
 
     if "users" not in mongo.db.list_collection_names():
@@ -54,32 +85,14 @@ def init_db(app):
    
     
     if "history" not in mongo.db.list_collection_names():
-        history_validator = {
-        "$jsonSchema": {
-            "bsonType": "object",
-            "required": ["patient_id", "type", "created_at"],
-            "properties": {
-                "patient_id": {
-                    "bsonType": "objectId"
-                },
-                "type": {
-                    "enum": ["eye", "skin", "nail"]
-                },
-                "message": {
-                    "bsonType": "string"
-                },
-                "hb_level": {
-                    "bsonType": "string"
-                },
-                "created_at": {
-                    "bsonType": "date"
-                }
-            }
-        }
-    }
-        mongo.db.create_collection("history", validator=history_validator)
+        mongo.db.create_collection("history", validator=HISTORY_VALIDATOR)
         mongo.db.history.create_index([("patient_id", ASCENDING)])
 
+    # Sert l'historique trié et l'état (nombre, dernière date) utilisé pour les ETags
+    mongo.db.history.create_index([("patient_id", ASCENDING), ("created_at", DESCENDING)])
+    # Sert les tendances filtrées par type d'analyse
+    mongo.db.history.create_index([("patient_id", ASCENDING), ("type", ASCENDING), ("created_at", ASCENDING)])
+
 def create_user(email, password, firstname, lastname, sex):
     """
     Crée un nouvel utilisateur avec mot de passe hashé.
@@ -101,45 +114,28 @@ def create_user(email, password, firstname, lastname, sex):
 
 def get_all_users():
     """
-    Récupère tous les utilisateurs.
-    Convertit les ObjectId en string pour le JSON.
+    Récupère tous les utilisateurs (sans mot de passe).
+    Les ObjectId et dates sont sérialisés par le fournisseur JSON de l'application.
     """
-    users = list(mongo.db.users.find())
-    print(users)
-    for user in users:
-        user['_id'] = str(user['_id'])
-        user.pop('password', None)
-        if 'created_at' in user:
-            user['created_at'] = _serialize_datetime(user['created_at'])
+    users = list(mongo.db.users.find({}, {"password": 0}))
+    logger.debug("Utilisateurs récupérés", extra={"count": len(users)})
     return users
 
 def get_user_by_id(user_id):
     """
-    Récupère un utilisateur par son ID MongoDB.
+    Récupère un utilisateur par son ID MongoDB (sans mot de passe).
     """
     try:
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-        if user:
-            user['_id'] = str(user['_id'])
-            user.pop('password', None)
-            if 'created_at' in user:
-                user['created_at'] = _serialize_datetime(user['created_at'])
-        return user
+        return mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0})
     except Exception:
         return None
     
 def get_user_by_email(user_email):
     """
-    Récupère un utilisateur par son email MongoDB.
+    Récupère un utilisateur par son email MongoDB (sans mot de passe).
     """
     try:
-        user = mongo.db.users.find_one({"email": user_email})
-        if user:
-            user['_id'] = str(user['_id'])
-            user.pop('password', None)
-            if 'created_at' in user:
-                user['created_at'] = _serialize_datetime(user['created_at'])
-        return user
+        return mongo.db.users.find_one({"email": user_email}, {"password": 0})
     except Exception:
         return None
 
@@ -157,10 +153,11 @@ def authenticate_user(email, password):
     return None
 
 
-def create_history_entry(patient_id, analysis_type, message, hb_level=None):
+def create_history_entry(patient_id, analysis_type, message, hb_level=None, hb_value=None, model_version=None):
     """
     Ajoute une entrée dans l'historique d'un patient.
     patient_id doit être l'ID (string) de l'utilisateur.
+    hb_level est le texte affiché ("123.4 g/L"), hb_value la prédiction brute en g/L.
     """
     if isinstance(message, dict):
         message = ", ".join([f"{key}: {value}" for key, value in message.items()])
@@ -174,28 +171,123 @@ def create_history_entry(patient_id, analysis_type, message, hb_level=None):
         "type": analysis_type, 
         "message": message,
         "hb_level": hb_level, 
+        "hb_value": float(hb_value) if hb_value is not None else None,
+        "model_version": model_version,
         "created_at": datetime.now(timezone.utc)
     }
     
     result = mongo.db.history.insert_one(entry)
     return str(result.inserted_id)
 
-def get_patient_history(patient_id):
+def get_patient_history(patient_id, since=None):
     """
     Récupère tout l'historique d'un patient spécifique.
+    Si since (datetime) est fourni, ne retourne que les entrées créées depuis cette date (incluse).
     """
     try:
-        history = list(mongo.db.history.find({"patient_id": ObjectId(patient_id)}).sort("created_at", -1))
-        for item in history:
-            item['_id'] = str(item['_id'])
-            item['patient_id'] = str(item['patient_id'])
-            if 'created_at' in item:
-                item['created_at'] = _serialize_datetime(item['created_at'])
-        return history
+        query = {"patient_id": ObjectId(patient_id)}
+        if since is not None:
+            query["created_at"] = {"$gte": since}
+        return list(mongo.db.history.find(query).sort("created_at", -1))
     except Exception:
         return []
 
 
+def _parse_hb_level(hb_level):
+    """Extrait la valeur numérique d'un hb_level affiché ("123.4 g/L"), sinon None."""
+    match = _HB_LEVEL_PATTERN.match(hb_level or "")
+    return float(match.group(1)) if match else None
+
+
+def migrate_history_hb_values(batch_size=1000):
+    """
+    Migre les entrées existantes : renseigne hb_value à partir du texte hb_level
+    et marque model_version à "legacy". Idempotent, traite les documents par lots.
+    Retourne le nombre d'entrées mises à jour.
+    """
+    mongo.db.command("collMod", "history", validator=HISTORY_VALIDATOR)
+
+    cursor = mongo.db.history.find(
+        {"hb_value": {"$exists": False}},
+        {"hb_level": 1}
+    ).batch_size(batch_size)
+
+    updated = 0
+    operations = []
+    for entry in cursor:
+        operations.append(UpdateOne(
+            {"_id": entry["_id"]},
+            {"$set": {
+                "hb_value": _parse_hb_level(entry.get("hb_level")),
+                "model_version": "legacy"
+            }}
+        ))
+        if len(operations) >= batch_size:
+            updated += mongo.db.history.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += mongo.db.history.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+
+def get_hb_trends(patient_id, unit, start, end, analysis_type=None):
+    """
+    Agrège le taux d'hémoglobine d'un patient par type et par période (unit: day, week, month, year).
+    Retourne la moyenne, le minimum, le maximum et le nombre de scans de chaque période.
+    """
+    match = {
+        "patient_id": ObjectId(patient_id),
+        "created_at": {"$gte": start, "$lt": end},
+        "hb_value": {"$type": "number"}
+    }
+    if analysis_type:
+        match["type"] = analysis_type
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "type": "$type",
+                "bucket": {"$dateTrunc": {"date": "$created_at", "unit": unit}}
+            },
+            "avg": {"$avg": "$hb_value"},
+            "min": {"$min": "$hb_value"},
+            "max": {"$max": "$hb_value"},
+            "count": {"$sum": 1}
+        }},
+        {"$sort": {"_id.type": 1, "_id.bucket": 1}},
+        {"$project": {
+            "_id": 0,
+            "type": "$_id.type",
+            "bucket": "$_id.bucket",
+            "avg": {"$round": ["$avg", 1]},
+            "min": {"$round": ["$min", 1]},
+            "max": {"$round": ["$max", 1]},
+            "count": 1
+        }}
+    ]
+
+    return list(mongo.db.history.aggregate(pipeline))
+
+
+def get_history_state(patient_id):
+    """
+    Récupère l'état de l'historique d'un patient (nombre d'entrées, date de la plus récente)
+    sans charger les documents, pour construire les ETags.
+    """
+    try:
+        query = {"patient_id": ObjectId(patient_id)}
+        scan_count = mongo.db.history.count_documents(query)
+        latest = mongo.db.history.find_one(query, {"created_at": 1, "_id": 0}, sort=[("created_at", -1)])
+        return {
+            "scan_count": scan_count,
+            "last_created_at": latest.get("created_at") if latest else None
+        }
+    except Exception:
+        return {"scan_count": 0, "last_created_at": None}
+
+
 def update_user_profile(user_email, firstname, lastname):
     """
     Met à jour le prénom et nom d'un utilisateur.
@@ -237,14 +329,3 @@ def delete_user_history(patient_id):
         return result.deleted_count
     except Exception:
         return 0
-
-
-def get_user_stats(patient_id):
-    """
-    Récupère les statistiques d'un utilisateur (nombre de scans, date d'inscription).
-    """
-    try:
-        scan_count = mongo.db.history.count_documents({"patient_id": ObjectId(patient_id)})
-        return {"scan_count": scan_count}
-    except Exception:
-        return {"scan_count": 0}
\ No newline at end of file
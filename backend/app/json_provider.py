@@ -0,0 +1,24 @@
+"""
+Fournisseur JSON de l'application pour les documents MongoDB
+Les ObjectId et datetime sont convertis pendant la sérialisation (callback
+'default' de l'encodeur C de json), sans parcourir les documents au préalable.
+La sortie est identique à l'ancienne conversion manuelle (str / isoformat).
+"""
+
+from datetime import datetime
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+
+def _mongo_default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Sérialise nativement les types BSON renvoyés par PyMongo"""
+
+    default = staticmethod(_mongo_default)
@@ -0,0 +1,145 @@
+"""
+Journalisation structurée et non bloquante pour Health Guard
+- Les threads de requête ne font que déposer l'enregistrement dans une file bornée
+  (QueueHandler) ; un thread dédié (QueueListener) formate en JSON et écrit.
+- File pleine : l'enregistrement est abandonné et compté, la requête n'attend jamais.
+- Chaque enregistrement porte l'identifiant de la requête (en-tête X-Request-ID ou généré).
+- Les événements fréquents peuvent être échantillonnés : extra={"sample_rate": 0.1}.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Attributs standard d'un LogRecord, exclus des champs structurés
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "sample_rate"}
+
+_listener = None
+_dropped = 0
+_dropped_lock = threading.Lock()
+
+
+def get_request_id():
+    """Retourne l'identifiant de la requête en cours, ou None hors requête"""
+    if has_request_context():
+        return g.get("request_id")
+    return None
+
+
+def get_dropped_count() -> int:
+    """Nombre d'enregistrements abandonnés faute de place dans la file"""
+    return _dropped
+
+
+class RequestContextFilter(logging.Filter):
+    """Ajoute l'identifiant de requête (exécuté dans le thread appelant)"""
+
+    def filter(self, record):
+        record.request_id = get_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Ne conserve qu'une fraction des enregistrements portant un attribut sample_rate"""
+
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        return rate is None or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui abandonne l'enregistrement plutôt que d'attendre une file pleine"""
+
+    def prepare(self, record):
+        # Figer message et trace ici : le thread d'écriture ne voit qu'une copie inerte
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _dropped_lock:
+                _dropped += 1
+
+
+def _assign_request_id():
+    g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+
+
+def _echo_request_id(response):
+    request_id = g.get("request_id")
+    if request_id:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
+def init_logging(app):
+    """
+    Configure le logger 'app' (et ses enfants) sur une file asynchrone bornée
+    et attribue un identifiant à chaque requête
+    """
+    global _listener
+
+    app.before_request(_assign_request_id)
+    app.after_request(_echo_request_id)
+
+    logger = logging.getLogger("app")
+    logger.setLevel(app.config["LOG_LEVEL"])
+
+    # create_app peut être appelé plusieurs fois (scripts, tests) : un seul écrivain
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=app.config["LOG_QUEUE_SIZE"]))
+    handler.addFilter(SamplingFilter())
+    handler.addFilter(RequestContextFilter())
+
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
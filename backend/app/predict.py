@@ -7,11 +7,18 @@ Gère l'analyse de 3 types d'images médicales :
 """
 
 import os
+import hashlib
+import logging
+import threading
 import numpy as np
 import tensorflow as tf
 import json
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from typing import Dict, Tuple, Optional, List
+from .profiling import active_profiler, attached
+
+logger = logging.getLogger(__name__)
 
 # Obtenir le chemin du répertoire de ce script 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,10 +29,18 @@ class MedicalAnalyzer:
     Classe unifiée pour gérer l'analyse de différents types d'images médicales
     """
     
-    def __init__(self):
-        """Initialise l'analyseur médical"""
+    def __init__(self, num_threads: Optional[int] = None):
+        """
+        Initialise l'analyseur médical
+        
+        Args:
+            num_threads: Threads par interpréteur TFLite (None = choix de TFLite)
+        """
+        self.num_threads = num_threads
         self.models = {}
         self.supported_types = ['nail', 'skin', 'eye']
+        self._load_lock = threading.Lock()
+        self._class_mapping = None
         
     def load_model(self, analysis_type: str):
         """
@@ -41,6 +56,23 @@ class MedicalAnalyzer:
         if analysis_type in self.models:
             return self.models[analysis_type]
         
+        with self._load_lock:
+            if analysis_type not in self.models:
+                self.models[analysis_type] = self._load_interpreter(analysis_type)
+                logger.info("Modèle %s chargé avec succès", analysis_type,
+                            extra={"model_version": self.models[analysis_type]['version']})
+        return self.models[analysis_type]
+    
+    def _load_interpreter(self, analysis_type: str) -> Dict:
+        """
+        Charge l'interpréteur TFLite d'un modèle depuis le disque
+        
+        Args:
+            analysis_type: Type d'analyse ('nail', 'skin', 'eye')
+        
+        Returns:
+            Dict avec l'interpréteur, ses tenseurs, sa version et un verrou d'invocation
+        """
         # Chemins des modèles
         model_paths = {
             'nail': os.path.join(SCRIPT_DIR, "ml_models", "nail_anemia_model.tflite"),
@@ -54,18 +86,112 @@ class MedicalAnalyzer:
             raise FileNotFoundError(f"Modèle non trouvé: {model_path}")
         
         # Charger le modèle TFLite
-        interpreter = tf.lite.Interpreter(model_path=model_path)
+        interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=self.num_threads)
         interpreter.allocate_tensors()
+        input_details = interpreter.get_input_details()
         
-        # Stocker le modèle
-        self.models[analysis_type] = {
+        # Un interpréteur TFLite ne supporte pas les invocations concurrentes
+        return {
             'interpreter': interpreter,
-            'input_details': interpreter.get_input_details(),
-            'output_details': interpreter.get_output_details()
+            'input_details': input_details,
+            'output_details': interpreter.get_output_details(),
+            'version': self._model_version(analysis_type, model_path),
+            'batch_size': int(input_details[0]['shape'][0]),
+            'batchable': True,
+            'lock': threading.Lock()
         }
+    
+    @staticmethod
+    def _model_version(analysis_type: str, model_path: str) -> str:
+        """
+        Calcule une version stable du modèle à partir de l'empreinte du fichier
         
-        print(f"Modèle {analysis_type} chargé avec succès")
-        return self.models[analysis_type]
+        Args:
+            analysis_type: Type d'analyse ('nail', 'skin', 'eye')
+            model_path: Chemin vers le fichier .tflite
+        
+        Returns:
+            Version de la forme '<type>-<sha256 tronqué>'
+        """
+        digest = hashlib.sha256()
+        with open(model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return f"{analysis_type}-{digest.hexdigest()[:12]}"
+    
+    def _run_model(self, analysis_type: str, images: np.ndarray) -> np.ndarray:
+        """
+        Exécute l'inférence d'un modèle sur un lot de tenseurs déjà prétraités
+        
+        Si le modèle n'accepte pas de lot, les images sont passées une à une.
+        
+        Args:
+            analysis_type: Type d'analyse ('nail', 'skin', 'eye')
+            images: Tenseur des images (N, H, W, 3)
+        
+        Returns:
+            Tenseur de sortie du modèle (N, ...)
+        """
+        model = self.load_model(analysis_type)
+        with model['lock']:
+            if model['batchable'] or len(images) == 1:
+                try:
+                    self._resize_input(model, len(images))
+                except (RuntimeError, ValueError):
+                    # Seul un échec de redimensionnement désactive les lots ; le
+                    # tenseur d'entrée est remis à la taille 1 juste après
+                    if len(images) == 1:
+                        raise
+                    model['batchable'] = False
+                else:
+                    return self._invoke(model, images)
+            
+            self._resize_input(model, 1)
+            return np.concatenate([self._invoke(model, images[i:i + 1]) for i in range(len(images))])
+    
+    @staticmethod
+    def _resize_input(model: Dict, batch_size: int):
+        """Adapte la taille du lot de l'interpréteur (verrou déjà pris) si elle diffère"""
+        if model['batch_size'] == batch_size:
+            return
+        
+        interpreter = model['interpreter']
+        input_details = model['input_details'][0]
+        # Réinitialisé avant l'allocation pour forcer un nouveau redimensionnement en cas d'échec
+        model['batch_size'] = None
+        interpreter.resize_tensor_input(input_details['index'], [batch_size, *input_details['shape'][1:]])
+        interpreter.allocate_tensors()
+        model['batch_size'] = batch_size
+    
+    @staticmethod
+    def _invoke(model: Dict, images: np.ndarray) -> np.ndarray:
+        """Invoque l'interpréteur (verrou déjà pris, taille du lot déjà ajustée)"""
+        interpreter = model['interpreter']
+        interpreter.set_tensor(model['input_details'][0]['index'], images)
+        interpreter.invoke()
+        return interpreter.get_tensor(model['output_details'][0]['index'])
+    
+    def _input_size(self, analysis_type: str) -> int:
+        """Retourne la taille d'entrée carrée attendue par le modèle"""
+        model = self.load_model(analysis_type)
+        return int(model['input_details'][0]['shape'][1])
+    
+    def load_image(self, image_path: str) -> Image.Image:
+        """
+        Décode une image en RGB
+        
+        Args:
+            image_path: Chemin ou objet fichier de l'image
+        
+        Returns:
+            Image PIL en mode RGB
+        """
+        img = Image.open(image_path)
+        
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        return img
     
     def preprocess_image(self, image_path: str, img_size: int = 224) -> np.ndarray:
         """
@@ -78,11 +204,19 @@ class MedicalAnalyzer:
         Returns:
             Tableau numpy de l'image prétraitée
         """
-        img = Image.open(image_path)
+        return self._to_tensor(self.load_image(image_path), img_size)
+    
+    def _to_tensor(self, img: Image.Image, img_size: int = 224) -> np.ndarray:
+        """
+        Redimensionne et normalise une image RGB déjà décodée
         
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+        Args:
+            img: Image PIL en mode RGB
+            img_size: Taille de l'image après redimensionnement
         
+        Returns:
+            Tableau numpy de l'image prétraitée
+        """
         img = img.resize((img_size, img_size), Image.Resampling.LANCZOS)
         img_array = np.array(img)
         img_array = img_array.astype('float32') / 255.0
@@ -103,24 +237,10 @@ class MedicalAnalyzer:
             Dict avec les résultats de l'analyse
         """
         try:
-            # Charger le modèle
-            model = self.load_model(analysis_type)
-            
             # Prétraiter l'image
-            image = self.preprocess_image(image_path)
+            image = self.preprocess_image(image_path, self._input_size(analysis_type))
             
-            # Faire la prédiction
-            model['interpreter'].set_tensor(model['input_details'][0]['index'], image)
-            model['interpreter'].invoke()
-            prediction = model['interpreter'].get_tensor(model['output_details'][0]['index'])
-            hb_level = float(prediction[0][0])
-            
-            # Interpréter les résultats selon le sexe
-            result = self._interpret_anemia_result(hb_level, sexe)
-            result['analysis_type'] = analysis_type
-            result['success'] = True
-            
-            return result
+            return self._predict_anemia(image, sexe, analysis_type)
             
         except Exception as e:
             return {
@@ -129,6 +249,42 @@ class MedicalAnalyzer:
                 'analysis_type': analysis_type
             }
     
+    def _predict_anemia(self, image: np.ndarray, sexe: str, analysis_type: str) -> Dict:
+        """
+        Prédit et interprète le taux d'hémoglobine à partir d'un tenseur prétraité
+        
+        Args:
+            image: Tenseur de l'image
+            sexe: 'M' ou 'F'
+            analysis_type: 'nail' ou 'eye'
+        
+        Returns:
+            Dict avec les résultats de l'analyse
+        """
+        prediction = self._run_model(analysis_type, image)
+        return self._anemia_result(float(prediction[0][0]), sexe, analysis_type)
+    
+    def _anemia_result(self, hb_level: float, sexe: str, analysis_type: str) -> Dict:
+        """
+        Construit le résultat d'anémie à partir du taux d'hémoglobine prédit
+        
+        Args:
+            hb_level: Niveau d'hémoglobine prédit en g/L
+            sexe: 'M' ou 'F'
+            analysis_type: 'nail' ou 'eye'
+        
+        Returns:
+            Dict avec les résultats de l'analyse
+        """
+        # Interpréter les résultats selon le sexe
+        result = self._interpret_anemia_result(hb_level, sexe)
+        result['hb_value'] = hb_level
+        result['model_version'] = self.models[analysis_type]['version']
+        result['analysis_type'] = analysis_type
+        result['success'] = True
+        
+        return result
+    
     def analyze_nail(self, image_path: str, sexe: str) -> Dict:
         """
         Analyse une image d'ongle pour détecter l'anémie
@@ -154,45 +310,10 @@ class MedicalAnalyzer:
             Dict avec les résultats de l'analyse
         """
         try:
-            # Charger le modèle
-            model = self.load_model('skin')
-            
-            # Charger le mapping des classes
-            class_mapping_path = os.path.join(SCRIPT_DIR, "ml_models", "class_mapping.json")
-            if not os.path.exists(class_mapping_path):
-                raise FileNotFoundError(f"Mapping des classes non trouvé: {class_mapping_path}")
-            
-            with open(class_mapping_path, 'r', encoding='utf-8') as f:
-                class_mapping = json.load(f)
-            class_mapping = {int(k): v for k, v in class_mapping.items()}
-            
             # Prétraiter l'image
-            image = self.preprocess_image(image_path)
+            image = self.preprocess_image(image_path, self._input_size('skin'))
             
-            # Faire la prédiction
-            model['interpreter'].set_tensor(model['input_details'][0]['index'], image)
-            model['interpreter'].invoke()
-            predictions = model['interpreter'].get_tensor(model['output_details'][0]['index'])[0]
-            
-            # Obtenir les top K prédictions
-            top_indices = np.argsort(predictions)[-top_k:][::-1]
-            
-            results = []
-            for idx in top_indices:
-                class_name = class_mapping[idx]
-                probability = float(predictions[idx])
-                results.append({
-                    'disease': class_name,
-                    'confidence': round(probability * 100, 2)
-                })
-            
-            return {
-                'success': True,
-                'analysis_type': 'skin',
-                'predictions': results,
-                'primary_diagnosis': results[0]['disease'],
-                'confidence': results[0]['confidence']
-            }
+            return self._predict_skin(image, top_k)
             
         except Exception as e:
             return {
@@ -201,6 +322,67 @@ class MedicalAnalyzer:
                 'analysis_type': 'skin'
             }
     
+    def _predict_skin(self, image: np.ndarray, top_k: int = 3) -> Dict:
+        """
+        Prédit les maladies cutanées les plus probables à partir d'un tenseur prétraité
+        
+        Args:
+            image: Tenseur de l'image
+            top_k: Nombre de prédictions à retourner
+        
+        Returns:
+            Dict avec les résultats de l'analyse
+        """
+        # Faire la prédiction
+        predictions = self._run_model('skin', image)[0]
+        return self._skin_result(predictions, top_k)
+    
+    def _load_class_mapping(self) -> Dict[int, str]:
+        """Charge (une seule fois) le mapping index -> maladie du modèle de peau"""
+        if self._class_mapping is None:
+            class_mapping_path = os.path.join(SCRIPT_DIR, "ml_models", "class_mapping.json")
+            if not os.path.exists(class_mapping_path):
+                raise FileNotFoundError(f"Mapping des classes non trouvé: {class_mapping_path}")
+            
+            with open(class_mapping_path, 'r', encoding='utf-8') as f:
+                class_mapping = json.load(f)
+            self._class_mapping = {int(k): v for k, v in class_mapping.items()}
+        return self._class_mapping
+    
+    def _skin_result(self, predictions: np.ndarray, top_k: int = 3) -> Dict:
+        """
+        Construit le résultat cutané à partir des probabilités d'une image
+        
+        Args:
+            predictions: Probabilités par classe
+            top_k: Nombre de prédictions à retourner
+        
+        Returns:
+            Dict avec les résultats de l'analyse
+        """
+        class_mapping = self._load_class_mapping()
+        
+        # Obtenir les top K prédictions
+        top_indices = np.argsort(predictions)[-top_k:][::-1]
+        
+        results = []
+        for idx in top_indices:
+            class_name = class_mapping[idx]
+            probability = float(predictions[idx])
+            results.append({
+                'disease': class_name,
+                'confidence': round(probability * 100, 2)
+            })
+        
+        return {
+            'success': True,
+            'analysis_type': 'skin',
+            'predictions': results,
+            'primary_diagnosis': results[0]['disease'],
+            'confidence': results[0]['confidence'],
+            'model_version': self.models['skin']['version']
+        }
+    
     def analyze_eye(self, image_path: str, sexe: str) -> Dict:
         """
         Analyse une image d'œil pour détecter l'anémie
@@ -303,6 +485,132 @@ class MedicalAnalyzer:
                 'error': f"Type d'analyse non supporté: {analysis_type}",
                 'supported_types': self.supported_types
             }
+    
+    def analyze_batch(self, image_paths: List[str], analysis_type: str, sexes) -> List[Dict]:
+        """
+        Analyse un lot d'images avec un seul modèle en une invocation groupée
+        
+        Args:
+            image_paths: Chemins vers les images
+            analysis_type: Type d'analyse ('nail', 'skin', 'eye')
+            sexes: 'M'/'F' pour tout le lot, ou une liste alignée sur image_paths
+        
+        Returns:
+            Liste de résultats, dans l'ordre de image_paths
+        """
+        if isinstance(sexes, str):
+            sexes = [sexes] * len(image_paths)
+        
+        def failure(error: str) -> Dict:
+            return {'success': False, 'error': error, 'analysis_type': analysis_type}
+        
+        try:
+            size = self._input_size(analysis_type)
+        except Exception as e:
+            return [failure(str(e)) for _ in image_paths]
+        
+        # Décoder chaque image ; une image illisible n'invalide pas le lot
+        results = [None] * len(image_paths)
+        tensors, positions = [], []
+        for i, image_path in enumerate(image_paths):
+            try:
+                tensors.append(self.preprocess_image(image_path, size))
+                positions.append(i)
+            except Exception as e:
+                results[i] = failure(str(e))
+        
+        if tensors:
+            try:
+                outputs = self._run_model(analysis_type, np.concatenate(tensors))
+            except Exception as e:
+                outputs = None
+                for i in positions:
+                    results[i] = failure(str(e))
+            
+            if outputs is not None:
+                for row, i in enumerate(positions):
+                    try:
+                        if analysis_type == 'skin':
+                            results[i] = self._skin_result(outputs[row])
+                        else:
+                            results[i] = self._anemia_result(float(outputs[row][0]), sexes[i], analysis_type)
+                    except Exception as e:
+                        results[i] = failure(str(e))
+        
+        return results
+    
+    def analyze_many(self, image_path: str, analysis_types: List[str], **kwargs) -> Dict:
+        """
+        Analyse une même image avec plusieurs modèles en parallèle
+        
+        L'image est décodée une seule fois et redimensionnée une fois par taille
+        d'entrée distincte ; le tenseur partagé alimente chaque interpréteur.
+        Chaque modèle est chargé dans son worker : un échec est rapporté pour
+        son type seulement.
+        
+        Args:
+            image_path: Chemin vers l'image
+            analysis_types: Types d'analyse à exécuter ('nail', 'skin', 'eye')
+            **kwargs: Arguments additionnels (ex: sexe pour nail et eye)
+        
+        Returns:
+            Dict avec un résultat par type d'analyse
+        """
+        unsupported = [t for t in analysis_types if t not in self.supported_types]
+        if unsupported:
+            return {
+                'success': False,
+                'error': f"Type d'analyse non supporté: {', '.join(unsupported)}",
+                'supported_types': self.supported_types
+            }
+        
+        sexe = kwargs.get('sexe', 'M')
+        
+        try:
+            img = self.load_image(image_path)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'analysis_type': analysis_types
+            }
+        
+        # Un redimensionnement par taille d'entrée distincte, partagé entre les workers
+        tensors = {}
+        tensors_lock = threading.Lock()
+        
+        def tensor_for(size: int) -> np.ndarray:
+            with tensors_lock:
+                if size not in tensors:
+                    tensors[size] = self._to_tensor(img, size)
+                return tensors[size]
+        
+        # Les workers rejoignent le profilage éventuel de la requête
+        profiler = active_profiler()
+        
+        def run(analysis_type: str) -> Dict:
+            # Un modèle absent ou invalide n'échoue que pour son propre type
+            try:
+                with attached(profiler):
+                    image = tensor_for(self._input_size(analysis_type))
+                    if analysis_type == 'skin':
+                        return self._predict_skin(image)
+                    return self._predict_anemia(image, sexe, analysis_type)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'analysis_type': analysis_type
+                }
+        
+        with ThreadPoolExecutor(max_workers=len(analysis_types)) as executor:
+            results = dict(zip(analysis_types, executor.map(run, analysis_types)))
+        
+        return {
+            'success': any(r['success'] for r in results.values()),
+            'analysis_type': analysis_types,
+            'results': results
+        }
 
 
 # Créer une instance globale pour réutilisation
@@ -0,0 +1,167 @@
+"""
+Profilage à la demande des requêtes de Health Guard
+Un profileur par échantillonnage relève périodiquement la pile des threads de la
+requête (route et workers de MedicalAnalyzer) et écrit un fichier au format
+"folded stacks", directement exploitable par flamegraph.pl ou speedscope.
+Désactivé, il ne coûte qu'une lecture de configuration par requête.
+"""
+
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional
+from flask import current_app, request
+from .logs import get_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-Token"
+
+_local = threading.local()
+
+
+class SamplingProfiler:
+    """
+    Échantillonne la pile d'appels d'un ensemble de threads depuis un thread dédié
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Args:
+            interval: Période d'échantillonnage en secondes
+        """
+        self.interval = interval
+        self.samples = Counter()
+        self._threads = set()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._output_path = None
+
+    def attach(self, thread_id: Optional[int] = None):
+        """Ajoute un thread (par défaut le thread courant) aux threads échantillonnés"""
+        self._threads.add(thread_id or threading.get_ident())
+
+    def detach(self, thread_id: Optional[int] = None):
+        """Retire un thread des threads échantillonnés"""
+        self._threads.discard(thread_id or threading.get_ident())
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self, output_path: Optional[str] = None):
+        """
+        Arrête l'échantillonnage ; le fichier est écrit par le thread du profileur
+        pour ne pas bloquer la requête
+
+        Args:
+            output_path: Fichier de sortie au format folded stacks
+        """
+        self._output_path = output_path
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in tuple(self._threads):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[_fold(frame)] += 1
+
+        if self._output_path:
+            try:
+                self.write(self._output_path)
+            except OSError as e:
+                logger.warning("Écriture du profil impossible (%s) : %s", self._output_path, e)
+
+    def write(self, path: str):
+        """Écrit les échantillons au format folded stacks ('f1;f2;f3 <nombre>')"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _fold(frame) -> str:
+    """Sérialise une pile d'appels de la racine vers la feuille"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        name = getattr(code, 'co_qualname', code.co_name)
+        names.append(f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def active_profiler() -> Optional[SamplingProfiler]:
+    """Retourne le profileur de la requête en cours sur ce thread, s'il y en a un"""
+    return getattr(_local, 'profiler', None)
+
+
+@contextmanager
+def attached(profiler: Optional[SamplingProfiler]):
+    """Échantillonne aussi le thread courant (ex: worker d'analyse) pendant le bloc"""
+    if profiler is None:
+        yield
+        return
+    profiler.attach()
+    try:
+        yield
+    finally:
+        profiler.detach()
+
+
+def _should_profile(config) -> bool:
+    token = config.get("PROFILING_TOKEN")
+    header = request.headers.get(PROFILE_HEADER)
+    # Comparaison en octets : compare_digest refuse les str non ASCII (en-têtes décodés en latin-1)
+    if token and header and hmac.compare_digest(header.encode('utf-8'), token.encode('utf-8')):
+        return True
+    rate = config.get("PROFILING_SAMPLE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def _safe_tag(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_+-]', '', value)[:64] or "unknown"
+
+
+def _analysis_tag(values) -> str:
+    """Étiquette des types demandés : 'eye,nail' ou deux champs 'type' donnent 'eye+nail'"""
+    types = [item.strip() for value in values for item in value.split(',') if item.strip()]
+    return _safe_tag("+".join(types))
+
+
+def profile_request(view):
+    """
+    Décorateur de route : profile la requête si le profilage est activé et que
+    la requête porte un jeton autorisé ou est tirée par le taux d'échantillonnage
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        config = current_app.config
+        if not config.get("PROFILING_ENABLED") or not _should_profile(config):
+            return view(*args, **kwargs)
+
+        request_id = _safe_tag(get_request_id() or "")
+        analysis_type = _analysis_tag(request.form.getlist('type'))
+
+        profiler = SamplingProfiler(config.get("PROFILING_INTERVAL_MS", 5) / 1000.0)
+        profiler.attach()
+        _local.profiler = profiler
+        profiler.start()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _local.profiler = None
+            filename = f"{time.strftime('%Y%m%dT%H%M%S')}_{analysis_type}_{request_id}.folded"
+            profiler.stop(os.path.join(config.get("PROFILING_DIR", "./profiles"), filename))
+
+    return wrapper
@@ -0,0 +1,214 @@
+"""
+Contrôle qualité des images avant inférence pour Health Guard
+Vérifie rapidement, sur une version réduite de l'image :
+- Netteté : variance du Laplacien (photo floue)
+- Exposition : luminosité moyenne et proportion de pixels saturés
+- Région : présence approximative de tissu (teinte peau / muqueuse)
+Une image rejetée renvoie une réponse "retake" sans solliciter le modèle.
+"""
+
+import io
+import logging
+import threading
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Côté maximal de l'image réduite utilisée pour les mesures
+GATE_MAX_SIDE = 256
+
+# Seuils par défaut, surchargeables par les variables QUALITY_GATE_<NOM EN MAJUSCULES>
+DEFAULT_THRESHOLDS = {
+    'min_blur_variance': 60.0,
+    'min_brightness': 40.0,
+    'max_brightness': 220.0,
+    'max_clipped_ratio': 0.25,
+    'max_crushed_ratio': 0.25,
+    'min_region_ratio': 0.08,
+}
+
+RETAKE_MESSAGES = {
+    'blurry': "Photo floue, stabilisez l'appareil et faites la mise au point",
+    'too_dark': "Photo trop sombre, placez-vous dans un endroit mieux éclairé",
+    'overexposed': "Photo surexposée, évitez la lumière directe et le flash",
+    'region_not_found': "Zone à analyser introuvable, cadrez l'ongle, l'œil ou la peau au centre",
+    'unreadable': "Image illisible, veuillez reprendre la photo",
+}
+
+# Compteurs exposés par /health
+_metrics_lock = threading.Lock()
+_metrics = {
+    'checked': 0,
+    'passed': 0,
+    'rejected': 0,
+    'over_budget': 0,
+    'total_ms': 0.0,
+}
+
+
+def _record(passed: bool, elapsed_ms: float, budget_ms: Optional[float]):
+    with _metrics_lock:
+        _metrics['checked'] += 1
+        _metrics['passed' if passed else 'rejected'] += 1
+        _metrics['total_ms'] += elapsed_ms
+        if budget_ms is not None and elapsed_ms > budget_ms:
+            _metrics['over_budget'] += 1
+
+
+def get_quality_metrics() -> Dict:
+    """Retourne un instantané des compteurs du contrôle qualité"""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    total_ms = snapshot.pop('total_ms')
+    checked = snapshot['checked']
+    snapshot['avg_ms'] = round(total_ms / checked, 2) if checked else 0.0
+    return snapshot
+
+
+def _decode_with_pil(source) -> Optional[np.ndarray]:
+    """
+    Décode avec PIL les formats qu'OpenCV ne lit pas (GIF, ...), comme le fait l'inférence
+
+    Args:
+        source: Chemin ou flux binaire de l'image
+
+    Returns:
+        Image BGR réduite à GATE_MAX_SIDE, ou None si PIL ne la lit pas non plus
+    """
+    try:
+        with Image.open(source) as pil_img:
+            pil_img.thumbnail((GATE_MAX_SIDE, GATE_MAX_SIDE))
+            rgb = np.asarray(pil_img.convert('RGB'))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def _decode_downscaled(image_file) -> Optional[np.ndarray]:
+    """
+    Décode l'image directement à résolution réduite puis la ramène à GATE_MAX_SIDE
+
+    Args:
+        image_file: Chemin ou objet fichier (FileStorage) de l'image
+
+    Returns:
+        Image BGR réduite, ou None si elle est illisible
+    """
+    if isinstance(image_file, str):
+        img = cv2.imread(image_file, cv2.IMREAD_REDUCED_COLOR_4)
+        if img is None:
+            img = _decode_with_pil(image_file)
+    else:
+        # Lire les octets puis rembobiner pour que l'inférence relise le fichier
+        data = image_file.read()
+        image_file.seek(0)
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        img = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_COLOR_4) if buffer.size else None
+        if img is None and data:
+            img = _decode_with_pil(io.BytesIO(data))
+
+    if img is None:
+        return None
+
+    height, width = img.shape[:2]
+    scale = GATE_MAX_SIDE / max(height, width)
+    if scale < 1:
+        img = cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return img
+
+
+def check_image_quality(image_file, analysis_type: str, thresholds: Optional[Dict] = None,
+                        budget_ms: Optional[float] = None) -> Dict:
+    """
+    Évalue la qualité d'une photo avant de lancer l'analyse
+
+    Args:
+        image_file: Chemin ou objet fichier de l'image
+        analysis_type: Type d'analyse ('nail', 'skin', 'eye')
+        thresholds: Seuils à surcharger (voir DEFAULT_THRESHOLDS)
+        budget_ms: Budget de latence ; un dépassement est journalisé et compté
+
+    Returns:
+        Dict avec 'passed', les raisons de rejet et les mesures effectuées
+    """
+    limits = dict(DEFAULT_THRESHOLDS)
+    if thresholds:
+        limits.update(thresholds)
+
+    start = time.perf_counter()
+    img = _decode_downscaled(image_file)
+
+    if img is None:
+        reasons = ['unreadable']
+        measures = {}
+    else:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        blur_variance = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        brightness = float(gray.mean())
+        clipped_ratio = float(np.count_nonzero(gray >= 250)) / gray.size
+        crushed_ratio = float(np.count_nonzero(gray <= 5)) / gray.size
+
+        # Plage YCrCb classique de la peau, qui couvre aussi ongles et conjonctive
+        ycrcb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
+        region_mask = cv2.inRange(ycrcb, (0, 133, 77), (255, 180, 135))
+        region_ratio = float(np.count_nonzero(region_mask)) / region_mask.size
+
+        reasons = []
+        if blur_variance < limits['min_blur_variance']:
+            reasons.append('blurry')
+        if brightness < limits['min_brightness'] or crushed_ratio > limits['max_crushed_ratio']:
+            reasons.append('too_dark')
+        if brightness > limits['max_brightness'] or clipped_ratio > limits['max_clipped_ratio']:
+            reasons.append('overexposed')
+        if region_ratio < limits['min_region_ratio']:
+            reasons.append('region_not_found')
+
+        measures = {
+            'blur_variance': round(blur_variance, 2),
+            'brightness': round(brightness, 2),
+            'clipped_ratio': round(clipped_ratio, 4),
+            'crushed_ratio': round(crushed_ratio, 4),
+            'region_ratio': round(region_ratio, 4),
+        }
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    passed = not reasons
+    _record(passed, elapsed_ms, budget_ms)
+
+    if budget_ms is not None and elapsed_ms > budget_ms:
+        logger.warning("Contrôle qualité %s hors budget : %.1f ms > %.1f ms", analysis_type, elapsed_ms, budget_ms)
+
+    return {
+        'passed': passed,
+        'reasons': reasons,
+        'measures': measures,
+        'elapsed_ms': round(elapsed_ms, 2),
+    }
+
+
+def build_retake_response(analysis_type: str, quality: Dict) -> Dict:
+    """
+    Construit la réponse renvoyée au client quand la photo doit être reprise
+
+    Args:
+        analysis_type: Type d'analyse demandé
+        quality: Résultat de check_image_quality
+
+    Returns:
+        Dict structuré indiquant qu'une nouvelle photo est nécessaire
+    """
+    messages = [RETAKE_MESSAGES[reason] for reason in quality['reasons']]
+    return {
+        'success': False,
+        'retake': True,
+        'analysis_type': analysis_type,
+        'error': messages[0],
+        'reasons': quality['reasons'],
+        'messages': messages,
+        'quality': quality['measures'],
+    }
@@ -1,22 +1,107 @@
-from datetime import timedelta
-from app.db import authenticate_user, create_history_entry, create_user, get_all_users, get_patient_history, get_user_by_email, update_user_profile, change_user_password, delete_user_history, get_user_stats
-from flask import Blueprint, request, jsonify
-from .services import analyze_image
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import time
+from app.db import authenticate_user, create_history_entry, create_user, get_all_users, get_patient_history, get_user_by_email, update_user_profile, change_user_password, delete_user_history, get_history_state, get_hb_trends, TREND_UNITS
+from flask import Blueprint, current_app, request, jsonify, make_response
+from .services import analyze_image, analyze_images, quality_gate
+from .quality import get_quality_metrics
+from . import admission
+from .admission import Overloaded
+from .profiling import profile_request
+from .logs import get_dropped_count
 import os
-import traceback
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 
 main_bp = Blueprint('main', __name__)
 
+logger = logging.getLogger(__name__)
+
+ANALYSIS_TYPES = ['eye', 'skin', 'nail']
+
+
+def _parse_analysis_types(values):
+    """
+    Normalise le champ 'type' : une valeur, une liste séparée par des virgules,
+    plusieurs champs 'type' ou 'all'. Retourne None si un type est invalide.
+    """
+    types = []
+    for value in values:
+        for item in value.split(','):
+            item = item.strip()
+            if item == 'all':
+                candidates = ANALYSIS_TYPES
+            elif item in ANALYSIS_TYPES:
+                candidates = [item]
+            else:
+                return None
+            types.extend(t for t in candidates if t not in types)
+    return types or None
+
+
+def _state_etag(state, *extra):
+    """Construit un ETag faible à partir de l'état de l'historique (et de champs optionnels)."""
+    raw = "|".join(str(part) for part in (state['scan_count'], state['last_created_at'], *extra))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def _conditional_response(etag, build_payload, headers=None):
+    """
+    Retourne 304 si le client possède déjà la version courante (If-None-Match),
+    sinon construit la réponse JSON. build_payload n'est appelé que si nécessaire.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(jsonify(build_payload()), 200)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    return response
+
+
+def _overloaded(error, status):
+    """Réponse rapide de refus avec l'en-tête Retry-After."""
+    logger.warning("Requête refusée : %s", error, extra={
+        "status": status,
+        "retry_after": error.retry_after,
+        "sample_rate": current_app.config["LOG_SAMPLE_RATE"]
+    })
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, status
+
+
+def _history_fields(analysis_type, result):
+    """Extrait le message, le taux d'hémoglobine (texte et valeur brute) et la version du modèle à historiser."""
+    if analysis_type == 'skin':
+        return {
+            "message": result.get('primary_diagnosis', ''),
+            "model_version": result.get('model_version')
+        }
+    return {
+        "message": result.get('message', ''),
+        "hb_level": result.get('hb_level'),
+        "hb_value": result.get('hb_value'),
+        "model_version": result.get('model_version')
+    }
+
 @main_bp.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "active", "service": "HealthGuard Vision API"}), 200
+    return jsonify({
+        "status": "active",
+        "service": "HealthGuard Vision API",
+        "quality_gate": get_quality_metrics(),
+        "admission": admission.controller.stats(),
+        "logs_dropped": get_dropped_count()
+    }), 200
 
 @main_bp.route('/re-auth' , methods=['POST'])
 @jwt_required()
 def re_auth():
     current_user = get_jwt_identity()
-    print(f"Utilisateur connecté : {current_user}")
+    logger.debug("Renouvellement du jeton", extra={"user": current_user})
     access_token = create_access_token(identity=current_user, expires_delta=timedelta(hours=24))
     return jsonify({"token": access_token}), 200
 
@@ -43,6 +128,7 @@ def signup():
 
 @main_bp.route('/predict', methods=['POST'])
 @jwt_required()
+@profile_request
 def predict():
     current_user = get_jwt_identity()
 
@@ -54,28 +140,55 @@ def predict():
         return jsonify({"error": "Aucune image envoyée"}), 400
     
     file = request.files['image']
-    analysis_type = request.form.get('type') 
+    analysis_types = _parse_analysis_types(request.form.getlist('type'))
 
-    if not analysis_type or analysis_type not in ['eye', 'skin', 'nail']:
-        return jsonify({"error": "Type d'analyse manquant ou invalide (eye, skin, nail)"}), 400
+    if not analysis_types:
+        return jsonify({"error": "Type d'analyse manquant ou invalide (eye, skin, nail, all)"}), 400
 
+    start = time.perf_counter()
     try:
-        result = analyze_image(file, analysis_type, user['sex'])
+        # Photo inexploitable : ni jeton consommé, ni place d'inférence, ni entrée d'historique
+        retake = quality_gate(file, analysis_types[0] if len(analysis_types) == 1 else analysis_types)
+        if retake:
+            logger.info("Photo à reprendre", extra={
+                "analysis_type": analysis_types,
+                "reasons": retake['reasons'],
+                "sample_rate": current_app.config["LOG_SAMPLE_RATE"]
+            })
+            return jsonify(retake), 422
+
+        try:
+            # Un jeton par modèle exécuté : type=all coûte autant que trois requêtes
+            admission.rate_limiter.consume(current_user, cost=len(analysis_types))
+        except Overloaded as e:
+            return _overloaded(e, 429)
+
+        # La place ne couvre que l'inférence
+        with admission.controller.slot(analysis_types):
+            if len(analysis_types) == 1:
+                result = analyze_image(file, analysis_types[0], user['sex'])
+            else:
+                result = analyze_images(file, analysis_types, user['sex'])
         if not result:
             return jsonify({"error": "Analyse échouée, résultat vide"}), 500
 
-        # Extract message and hb_level for history
-        if analysis_type == 'skin':
-            message = result.get('primary_diagnosis', '')
-            hb_level = None
-        else:
-            message = result.get('message', '')
-            hb_level = result.get('hb_level')
-
-        create_history_entry(user['_id'], analysis_type, message, hb_level)
+        # One history entry per successful analysis type
+        results = result.get('results', {analysis_types[0]: result})
+        for analysis_type, type_result in results.items():
+            if not type_result.get('success'):
+                continue
+            create_history_entry(user['_id'], analysis_type, **_history_fields(analysis_type, type_result))
+
+        logger.info("Analyse terminée", extra={
+            "analysis_type": analysis_types,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "sample_rate": current_app.config["LOG_SAMPLE_RATE"]
+        })
         return jsonify(result), 200
+    except Overloaded as e:
+        return _overloaded(e, 503)
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Échec de l'analyse", extra={"analysis_type": analysis_types})
         return jsonify({"error": str(e)}), 500
     
 
@@ -101,9 +214,10 @@ def get_profile():
     user = get_user_by_email(current_user)
     if not user:
         return jsonify({"error": "User not found"}), 404
-    stats = get_user_stats(user['_id'])
-    user['scan_count'] = stats['scan_count']
-    return jsonify(user), 200
+    state = get_history_state(user['_id'])
+    user['scan_count'] = state['scan_count']
+    etag = _state_etag(state, user['_id'], user.get('firstname'), user.get('lastname'), user.get('sex'))
+    return _conditional_response(etag, lambda: user)
 
 
 @main_bp.route('/profile', methods=['PUT'])
@@ -195,8 +309,53 @@ def fetch_history():
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    history = get_patient_history(user['_id'])
-    return jsonify(history), 200
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({"error": "Paramètre since invalide (date ISO 8601 attendue)"}), 400
+
+    # L'ETag décrit l'état de tout l'historique, pas le corps renvoyé : il est donc
+    # identique avec ou sans ?since=. Le client le renvoie après fusion du delta,
+    # et un 304 signifie « rien de nouveau depuis ta copie complète ». Ne pas
+    # l'indexer sur since.
+    state = get_history_state(user['_id'])
+    etag = _state_etag(state, user['_id'])
+    return _conditional_response(
+        etag,
+        lambda: get_patient_history(user['_id'], since=since or None),
+        headers={'X-Total-Count': str(state['scan_count'])}
+    )
+
+
+@main_bp.route('/trends', methods=['GET'])
+@jwt_required()
+def fetch_trends():
+    current_user = get_jwt_identity()
+    user = get_user_by_email(current_user)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    analysis_type = request.args.get('type')
+    if analysis_type and analysis_type not in ['eye', 'nail']:
+        return jsonify({"error": "Type d'analyse invalide (eye, nail)"}), 400
+
+    unit = request.args.get('unit', 'week')
+    if unit not in TREND_UNITS:
+        return jsonify({"error": f"Unité invalide ({', '.join(TREND_UNITS)})"}), 400
+
+    try:
+        end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else datetime.now(timezone.utc)
+        if request.args.get('from'):
+            start = datetime.fromisoformat(request.args['from'])
+        else:
+            start = end - timedelta(days=int(request.args.get('days', 365)))
+    except ValueError:
+        return jsonify({"error": "Paramètres from/to/days invalides"}), 400
+
+    trends = get_hb_trends(user['_id'], unit, start, end, analysis_type)
+    return jsonify(trends), 200
 
 
 @main_bp.route('/history/<user_id>', methods=['GET'])
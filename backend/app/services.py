@@ -1,11 +1,32 @@
+from flask import current_app
 from .predict import MedicalAnalyzer, get_analyzer
+from .quality import check_image_quality, build_retake_response
+
+def quality_gate(image_file, analysis_type):
+    """
+    Retourne une réponse "retake" si la photo est inexploitable, sinon None.
+    À appeler avant analyze_image/analyze_images, hors de la place d'inférence.
+    """
+    config = current_app.config
+    if not config.get("QUALITY_GATE_ENABLED", True):
+        return None
+
+    quality = check_image_quality(
+        image_file,
+        analysis_type,
+        thresholds=config.get("QUALITY_GATE_THRESHOLDS"),
+        budget_ms=config.get("QUALITY_GATE_BUDGET_MS"),
+    )
+    if quality['passed']:
+        return None
+    return build_retake_response(analysis_type, quality)
 
 def analyze_image(image_file, analysis_type, sex):
 
     analyzer = get_analyzer()
     if not analyzer:
         raise ValueError("Analyseur non disponible")
-    
+
     result = analyzer.analyze(image_file, analysis_type, sexe=sex)
 
     if not result or not result.get('success'):
@@ -14,3 +35,19 @@ def analyze_image(image_file, analysis_type, sex):
 
     return result
 
+def analyze_images(image_file, analysis_types, sex):
+    """
+    Analyse une même image avec plusieurs modèles (décodage et prétraitement uniques).
+    Retourne un dict avec un résultat par type.
+    """
+    analyzer = get_analyzer()
+    if not analyzer:
+        raise ValueError("Analyseur non disponible")
+
+    result = analyzer.analyze_many(image_file, analysis_types, sexe=sex)
+
+    if not result or not result.get('success'):
+        error_msg = result.get('error', 'Analyse échouée') if result else 'Résultat vide'
+        raise ValueError(error_msg)
+
+    return result
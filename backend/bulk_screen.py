@@ -0,0 +1,204 @@
+"""
+Criblage hors ligne d'un lot d'images (campagnes de dépistage en clinique)
+
+Les images d'un dossier ou d'un manifeste sont réparties par lots entre des
+processus (un par cœur par défaut), chacun exécutant MedicalAnalyzer avec une
+inférence groupée. Les résultats sont écrits au fil de l'eau dans un fichier de
+reprise : relancer la même commande reprend là où le traitement s'est arrêté.
+
+Usage :
+    python bulk_screen.py images/ --type nail --sex F --output resultats.csv
+    python bulk_screen.py manifeste.csv --type eye --output resultats.parquet --workers 8
+
+Manifeste : fichier texte (un chemin par ligne) ou CSV avec une colonne 'path'
+et une colonne 'sex' optionnelle (M/F) par image.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from multiprocessing import get_context
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+COLUMNS = [
+    'path', 'type', 'sex', 'success', 'hb_value', 'hb_level', 'status', 'severity',
+    'primary_diagnosis', 'confidence', 'model_version', 'error'
+]
+
+_worker_analyzer = None
+
+
+def _init_worker():
+    """Charge un analyseur par processus, limité à un thread pour ne pas surcharger les cœurs"""
+    global _worker_analyzer
+    from app.predict import MedicalAnalyzer
+    _worker_analyzer = MedicalAnalyzer(num_threads=1)
+
+
+def _check_model(analysis_type):
+    """Charge le modèle dans un worker pour échouer tôt si le fichier est absent ou invalide"""
+    _worker_analyzer.load_model(analysis_type)
+
+
+def _score_batch(task):
+    analysis_type, items = task
+    paths = [path for path, _ in items]
+    sexes = [sex for _, sex in items]
+    results = _worker_analyzer.analyze_batch(paths, analysis_type, sexes)
+
+    rows = []
+    for (path, sex), result in zip(items, results):
+        row = {column: result.get(column) for column in COLUMNS}
+        row.update({'path': path, 'type': analysis_type, 'sex': sex})
+        rows.append(row)
+    return rows
+
+
+def collect_images(source, default_sex):
+    """
+    Liste les images à traiter sous forme de (chemin, sexe)
+
+    Args:
+        source: Dossier (parcouru récursivement) ou manifeste .csv / .txt
+        default_sex: Sexe utilisé quand le manifeste ne le précise pas
+    """
+    if os.path.isdir(source):
+        items = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    items.append((os.path.join(root, name), default_sex))
+        return sorted(items)
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='', encoding='utf-8') as f:
+        if source.lower().endswith('.csv'):
+            entries = [(row['path'], row.get('sex') or default_sex) for row in csv.DictReader(f)]
+        else:
+            entries = [(line.strip(), default_sex) for line in f if line.strip()]
+
+    # Les chemins relatifs du manifeste sont relatifs au manifeste
+    return [(path if os.path.isabs(path) else os.path.join(base, path), sex) for path, sex in entries]
+
+
+def read_checkpoint(checkpoint_path):
+    """
+    Retourne les chemins traités avec succès d'après le fichier de reprise ;
+    les images en échec sont retentées au lancement suivant
+    """
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, newline='', encoding='utf-8') as f:
+        return {row['path'] for row in csv.DictReader(f) if row['success'] == 'True'}
+
+
+def compact_checkpoint(checkpoint_path):
+    """Ne garde que la dernière ligne de chaque image (une image retentée apparaît deux fois)"""
+    with open(checkpoint_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    latest = {row['path']: row for row in rows}
+    if len(latest) == len(rows):
+        return
+
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(latest.values())
+    os.replace(tmp_path, checkpoint_path)
+
+
+def write_parquet(checkpoint_path, output_path):
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    table = pa_csv.read_csv(checkpoint_path)
+    pq.write_table(table, output_path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Criblage hors ligne d'images avec MedicalAnalyzer")
+    parser.add_argument('source', help="Dossier d'images ou manifeste (.csv avec colonne 'path', ou .txt)")
+    parser.add_argument('--type', required=True, choices=['nail', 'eye', 'skin'], dest='analysis_type')
+    parser.add_argument('--sex', choices=['M', 'F'], help="Sexe par défaut (requis pour nail/eye sans colonne 'sex')")
+    parser.add_argument('--output', required=True, help="Fichier de sortie .csv ou .parquet")
+    parser.add_argument('--checkpoint', help="Fichier de reprise (par défaut : la sortie CSV, ou <sortie>.checkpoint.csv)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=32)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    output_format = os.path.splitext(args.output)[1].lower()
+    if output_format not in ('.csv', '.parquet'):
+        sys.exit("La sortie doit être un fichier .csv ou .parquet")
+    if output_format == '.parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            sys.exit("La sortie Parquet nécessite pyarrow (pip install pyarrow)")
+
+    checkpoint_path = args.checkpoint or (
+        args.output if output_format == '.csv' else args.output + '.checkpoint.csv'
+    )
+
+    items = collect_images(args.source, args.sex)
+    if args.analysis_type != 'skin' and any(sex not in ('M', 'F') for _, sex in items):
+        sys.exit("Sexe manquant ou invalide : utilisez --sex ou une colonne 'sex' (M/F) dans le manifeste")
+
+    done = read_checkpoint(checkpoint_path)
+    pending = [item for item in items if item[0] not in done]
+    total = len(items)
+    print(f"{total} image(s), {len(done & {path for path, _ in items})} déjà traitée(s), "
+          f"{len(pending)} à traiter avec {args.workers} processus", file=sys.stderr)
+
+    tasks = [
+        (args.analysis_type, pending[i:i + args.batch_size])
+        for i in range(0, len(pending), args.batch_size)
+    ]
+
+    is_new = not os.path.exists(checkpoint_path) or os.path.getsize(checkpoint_path) == 0
+    processed, failed = total - len(pending), 0
+
+    # 'spawn' : le parent n'importe jamais TensorFlow, et aucun état TFLite
+    # (threads, verrous) n'est hérité par fork dans les workers
+    with get_context('spawn').Pool(processes=args.workers, initializer=_init_worker) as pool:
+        # Vérifier le modèle dans un worker avant de lancer les lots (sinon chaque image échouerait)
+        try:
+            pool.apply(_check_model, (args.analysis_type,))
+        except Exception as e:
+            sys.exit(f"Impossible de charger le modèle {args.analysis_type} : {e}")
+
+        start = time.monotonic()
+        with open(checkpoint_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            if is_new:
+                writer.writeheader()
+
+            for rows in pool.imap_unordered(_score_batch, tasks):
+                writer.writerows(rows)
+                f.flush()
+
+                processed += len(rows)
+                failed += sum(1 for row in rows if not row['success'])
+                rate = (processed - (total - len(pending))) / max(time.monotonic() - start, 1e-6)
+                print(f"\r{processed}/{total} images ({rate:.1f} img/s, {failed} échec(s))",
+                      end='', file=sys.stderr, flush=True)
+
+    print(file=sys.stderr)
+    compact_checkpoint(checkpoint_path)
+
+    # Le fichier de reprise est conservé : une relance ne retraite que les échecs
+    if output_format == '.parquet':
+        write_parquet(checkpoint_path, args.output)
+
+    print(f"Résultats écrits dans {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
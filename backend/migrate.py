@@ -0,0 +1,15 @@
+"""
+Migration de l'historique : renseigne hb_value (valeur numérique) et model_version
+pour les entrées créées avant le stockage numérique du taux d'hémoglobine.
+
+Usage : python migrate.py
+"""
+from app import create_app
+from app.db import migrate_history_hb_values
+
+app = create_app()
+
+if __name__ == '__main__':
+    with app.app_context():
+        updated = migrate_history_hb_values()
+    print(f"{updated} entrée(s) d'historique migrée(s)")
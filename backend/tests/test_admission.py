@@ -0,0 +1,138 @@
+"""
+Contrôle d'admission : file d'attente par modèle et limiteur de débit par utilisateur
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import admission
+from app.admission import AdmissionController, Overloaded, RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge manuelle pour le limiteur de débit"""
+    now = {"t": 1000.0}
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=lambda: now["t"]))
+
+    def advance(seconds):
+        now["t"] += seconds
+    return advance
+
+
+def test_full_queue_rejects_immediately():
+    controller = AdmissionController(max_concurrency=1, max_queue=0, max_queue_time=10)
+    with controller.slot(["eye"]):
+        start = time.monotonic()
+        with pytest.raises(Overloaded, match="file d'attente pleine"):
+            with controller.slot(["eye"]):
+                pass
+        assert time.monotonic() - start < 1
+    assert controller.stats()["waiting"] == 0
+
+
+def test_queue_timeout_rejects():
+    controller = AdmissionController(max_concurrency=1, max_queue=4, max_queue_time=0.05)
+    with controller.slot(["eye"]):
+        with pytest.raises(Overloaded, match="délai d'attente dépassé"):
+            with controller.slot(["eye"]):
+                pass
+    assert controller.stats()["waiting"] == 0
+
+
+def test_waiting_request_gets_released_slot():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, max_queue_time=5)
+    admitted = threading.Event()
+
+    def wait_for_slot():
+        with controller.slot(["eye"]):
+            admitted.set()
+
+    with controller.slot(["eye"]):
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        assert not admitted.wait(0.05)
+    waiter.join(timeout=5)
+    assert admitted.is_set()
+
+
+@pytest.mark.parametrize("max_queue_time, retry_after", [(0.05, 1), (2.5, 3), (5, 5)])
+def test_retry_after_follows_max_queue_time(max_queue_time, retry_after):
+    controller = AdmissionController(max_concurrency=1, max_queue=0, max_queue_time=max_queue_time)
+    with controller.slot(["eye"]):
+        with pytest.raises(Overloaded) as excinfo:
+            with controller.slot(["eye"]):
+                pass
+    assert excinfo.value.retry_after == retry_after
+
+
+def test_slots_are_counted_per_model():
+    controller = AdmissionController(max_concurrency=1, max_queue=0, max_queue_time=0)
+    with controller.slot(["eye"]):
+        with controller.slot(["nail"]):
+            pass
+
+
+def test_failed_multi_model_request_releases_its_slots():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, max_queue_time=0.05)
+    with controller.slot(["nail"]):
+        with pytest.raises(Overloaded):
+            with controller.slot(["eye", "nail"]):
+                pass
+        # La place 'eye' prise avant l'échec sur 'nail' a été rendue
+        with controller.slot(["eye"]):
+            pass
+
+
+def test_burst_then_reject(clock):
+    limiter = RateLimiter(rate=1.0, burst=2)
+    limiter.consume("alice")
+    limiter.consume("alice")
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.consume("alice")
+    assert excinfo.value.retry_after == 1
+
+
+def test_identities_have_separate_buckets(clock):
+    limiter = RateLimiter(rate=1.0, burst=1)
+    limiter.consume("alice")
+    limiter.consume("bob")
+
+
+def test_bucket_refills_over_time(clock):
+    limiter = RateLimiter(rate=0.5, burst=1)
+    limiter.consume("alice")
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.consume("alice")
+    assert excinfo.value.retry_after == 2
+
+    clock(2)
+    limiter.consume("alice")
+
+
+def test_cost_consumes_several_tokens(clock):
+    limiter = RateLimiter(rate=1.0, burst=5)
+    limiter.consume("alice", cost=3)
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.consume("alice", cost=3)
+    assert excinfo.value.retry_after == 1
+    limiter.consume("alice", cost=2)
+
+
+def test_cost_is_capped_at_burst(clock):
+    limiter = RateLimiter(rate=1.0, burst=2)
+    limiter.consume("alice", cost=3)
+
+
+def test_purge_drops_refilled_buckets(clock):
+    limiter = RateLimiter(rate=1.0, burst=2)
+    limiter.PURGE_EVERY = 2
+    limiter.consume("alice")
+
+    clock(5)
+    limiter.consume("bob")
+    assert "alice" not in limiter._buckets
+    assert "bob" in limiter._buckets
@@ -0,0 +1,142 @@
+"""
+Compatibilité octet par octet du MongoJSONProvider avec l'ancienne sérialisation
+(conversion manuelle de _id / patient_id / dates puis jsonify par défaut).
+"""
+
+import copy
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from flask import Flask, jsonify
+
+from app.json_provider import MongoJSONProvider
+
+USER_ID = ObjectId("507f1f77bcf86cd799439011")
+
+# Documents tels que renvoyés par PyMongo (dates naïves en UTC)
+USER = {
+    "_id": USER_ID,
+    "email": "test@example.com",
+    "firstname": "Hélène",
+    "lastname": "Lefèvre",
+    "sex": "F",
+    "created_at": datetime(2026, 2, 10, 10, 30, 0, 123000),
+}
+
+HISTORY = [
+    {
+        "_id": ObjectId("507f1f77bcf86cd799439012"),
+        "patient_id": USER_ID,
+        "type": "eye",
+        "message": "Anémie légère détectée, surveillance et consultation médicale conseillée",
+        "hb_level": "118.5 g/L",
+        "hb_value": 118.53,
+        "model_version": "eye-0123456789ab",
+        "created_at": datetime(2026, 3, 1, 8, 15, 42, 507000),
+    },
+    {
+        "_id": ObjectId("507f1f77bcf86cd799439013"),
+        "patient_id": USER_ID,
+        "type": "skin",
+        "message": "Kératoses Séborrhéiques",
+        "hb_level": "",
+        "hb_value": None,
+        "model_version": None,
+        "created_at": datetime(2026, 2, 28, 23, 59, 59),
+    },
+]
+
+TRENDS = [
+    {"type": "eye", "bucket": datetime(2026, 2, 23), "avg": 118.5, "min": 118.5, "max": 118.5, "count": 1},
+    {"type": "nail", "bucket": datetime(2026, 3, 2), "avg": 131.2, "min": 124.0, "max": 138.4, "count": 4},
+]
+
+
+def _serialize_datetime(value):
+    """Ancienne conversion de db.py"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value
+    return str(value)
+
+
+def legacy_user(user):
+    user = dict(user)
+    user['_id'] = str(user['_id'])
+    user.pop('password', None)
+    if 'created_at' in user:
+        user['created_at'] = _serialize_datetime(user['created_at'])
+    return user
+
+
+def legacy_history(history):
+    history = copy.deepcopy(history)
+    for item in history:
+        item['_id'] = str(item['_id'])
+        item['patient_id'] = str(item['patient_id'])
+        if 'created_at' in item:
+            item['created_at'] = _serialize_datetime(item['created_at'])
+    return history
+
+
+def legacy_trends(trends):
+    trends = copy.deepcopy(trends)
+    for item in trends:
+        item['bucket'] = _serialize_datetime(item['bucket'])
+    return trends
+
+
+def export_payload(user, history):
+    """Forme de la réponse /export-data"""
+    return {
+        "user": {
+            "firstname": user.get('firstname', ''),
+            "lastname": user.get('lastname', ''),
+            "email": user.get('email', ''),
+            "sex": user.get('sex', ''),
+            "created_at": user.get('created_at', ''),
+        },
+        "history": history,
+        "exported_at": "2026-03-02T09:00:00.000000+00:00",
+    }
+
+
+@pytest.fixture(params=[False, True], ids=["production", "debug"])
+def apps(request):
+    legacy = Flask("legacy")
+    current = Flask("current")
+    current.json = MongoJSONProvider(current)
+    legacy.debug = current.debug = request.param
+    return legacy, current
+
+
+def _body(app, payload):
+    with app.app_context():
+        return jsonify(payload).get_data()
+
+
+@pytest.mark.parametrize("legacy_payload, raw_payload", [
+    (legacy_user(USER), USER),
+    (legacy_history(HISTORY), HISTORY),
+    (export_payload(legacy_user(USER), legacy_history(HISTORY)), export_payload(USER, HISTORY)),
+    (legacy_trends(TRENDS), TRENDS),
+    ([], []),
+], ids=["profile", "histories", "export-data", "trends", "empty"])
+def test_responses_are_byte_identical(apps, legacy_payload, raw_payload):
+    legacy, current = apps
+    assert _body(current, raw_payload) == _body(legacy, legacy_payload)
+
+
+def test_raw_documents_are_not_mutated(apps):
+    _, current = apps
+    history = copy.deepcopy(HISTORY)
+    _body(current, history)
+    assert history == HISTORY
+
+
+def test_other_types_fall_back_to_flask_default(apps):
+    _, current = apps
+    with pytest.raises(TypeError):
+        _body(current, {"value": object()})
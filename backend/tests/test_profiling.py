@@ -0,0 +1,52 @@
+"""
+Sélection des requêtes à profiler (jeton X-Profile-Token, taux d'échantillonnage)
+"""
+
+import pytest
+from flask import Flask
+
+from app.profiling import PROFILE_HEADER, _analysis_tag, _should_profile
+
+
+@pytest.fixture
+def app():
+    return Flask("profiling")
+
+
+def _decide(app, config, header=None):
+    headers = {PROFILE_HEADER: header} if header is not None else {}
+    with app.test_request_context("/predict", method="POST", headers=headers):
+        return _should_profile(config)
+
+
+def test_matching_token_profiles(app):
+    assert _decide(app, {"PROFILING_TOKEN": "secret"}, "secret")
+
+
+def test_wrong_token_does_not_profile(app):
+    assert not _decide(app, {"PROFILING_TOKEN": "secret"}, "other")
+
+
+@pytest.mark.parametrize("header", ["toké", "secrét", "☃"])
+def test_non_ascii_token_header_is_rejected_without_error(app, header):
+    assert not _decide(app, {"PROFILING_TOKEN": "secret"}, header)
+
+
+def test_missing_header_and_zero_rate_does_not_profile(app):
+    assert not _decide(app, {"PROFILING_TOKEN": "secret", "PROFILING_SAMPLE_RATE": 0.0})
+
+
+def test_full_sample_rate_profiles_without_token(app):
+    assert _decide(app, {"PROFILING_SAMPLE_RATE": 1.0})
+
+
+@pytest.mark.parametrize("values, tag", [
+    (["eye"], "eye"),
+    (["eye,nail"], "eye+nail"),
+    (["eye", "nail"], "eye+nail"),
+    (["all"], "all"),
+    ([], "unknown"),
+    (["../eye"], "eye"),
+])
+def test_analysis_tag_keeps_multi_type_separator(values, tag):
+    assert _analysis_tag(values) == tag
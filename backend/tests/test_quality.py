@@ -0,0 +1,62 @@
+"""
+Contrôle qualité des images avant inférence
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app import quality
+from app.quality import GATE_MAX_SIDE, _decode_downscaled, check_image_quality, get_quality_metrics
+
+
+def test_metrics_shape_does_not_depend_on_checked(monkeypatch):
+    monkeypatch.setattr(quality, "_metrics", dict(quality._metrics, checked=0, total_ms=0.0))
+    empty = get_quality_metrics()
+
+    monkeypatch.setattr(quality, "_metrics", dict(quality._metrics, checked=4, total_ms=10.0))
+    filled = get_quality_metrics()
+
+    assert set(empty) == set(filled)
+    assert "total_ms" not in empty
+    assert empty["avg_ms"] == 0.0
+    assert filled["avg_ms"] == 2.5
+
+
+def _encode(fmt):
+    # Dégradé horizontal : assez de contours pour ne pas être vide
+    gradient = np.tile(np.linspace(0, 255, 320, dtype=np.uint8), (240, 1))
+    buffer = io.BytesIO()
+    Image.fromarray(np.stack([gradient] * 3, axis=-1)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def opencv_without_codec(monkeypatch):
+    """Simule une build OpenCV sans le codec (GIF selon les versions, ...)"""
+    monkeypatch.setattr(quality.cv2, "imdecode", lambda *args: None)
+    monkeypatch.setattr(quality.cv2, "imread", lambda *args: None)
+
+
+def test_upload_falls_back_to_pil(opencv_without_codec):
+    upload = io.BytesIO(_encode("GIF"))
+    img = _decode_downscaled(upload)
+
+    assert img is not None
+    assert img.ndim == 3 and img.shape[2] == 3
+    assert max(img.shape[:2]) <= GATE_MAX_SIDE
+    # L'inférence relit le fichier depuis le début
+    assert upload.tell() == 0
+
+
+def test_path_falls_back_to_pil(opencv_without_codec, tmp_path):
+    path = tmp_path / "photo.gif"
+    path.write_bytes(_encode("GIF"))
+    assert _decode_downscaled(str(path)) is not None
+
+
+def test_garbage_is_still_unreadable():
+    result = check_image_quality(io.BytesIO(b"not an image"), "nail")
+    assert result["reasons"] == ["unreadable"]
@@ -53,6 +53,8 @@ export interface AnemiaAnalysisResult {
   analysis_type: "eye" | "nail";
   message: string;
   hb_level: string;
+  hb_value: number;
+  model_version: string;
   severity: "severe" | "moderate" | "light" | null;
   status: "anemia" | "normal" | "elevated";
 }
@@ -72,6 +74,8 @@ export interface HistoryRecord {
   type: "eye" | "skin" | "nail";
   message: string;
   hb_level: string;
+  hb_value?: number | null;
+  model_version?: string | null;
   created_at: string;
 }
 
@@ -131,6 +135,7 @@ export async function setToken(token: string): Promise<void> {
 }
 
 export async function removeToken(): Promise<void> {
+  responseCache.clear();
   if (Platform.OS === "web") {
     localStorage.removeItem(TOKEN_KEY);
     return;
@@ -192,6 +197,73 @@ async function request<T>(
   }
 }
 
+// ─── Conditional GET (ETag) ──────────────────────────────────────────
+
+interface CachedResponse<T> {
+  etag: string;
+  data: T;
+}
+
+/** Last response per endpoint, revalidated with If-None-Match */
+const responseCache = new Map<string, CachedResponse<unknown>>();
+
+interface ConditionalResult<T> {
+  data: T;
+  notModified: boolean;
+  etag: string | null;
+  totalCount: number | null;
+}
+
+/** GET that sends If-None-Match and reports 304 instead of treating it as an error */
+async function conditionalRequest<T>(
+  endpoint: string,
+  etag: string | undefined,
+): Promise<ConditionalResult<T | undefined>> {
+  const headers = await authHeaders();
+  if (etag) {
+    headers["If-None-Match"] = etag;
+  }
+
+  const response = await fetch(`${API_BASE_URL}${endpoint}`, { headers });
+  const totalCount = response.headers.get("X-Total-Count");
+  const result = {
+    etag: response.headers.get("ETag"),
+    totalCount: totalCount === null ? null : Number(totalCount),
+  };
+
+  if (response.status === 304) {
+    return { ...result, data: undefined, notModified: true };
+  }
+
+  if (!response.ok) {
+    const error = await response
+      .json()
+      .catch(() => ({ error: "Network error" }));
+    throw new Error(error.error || error.message || `HTTP ${response.status}`);
+  }
+
+  return { ...result, data: await response.json(), notModified: false };
+}
+
+/** Full GET revalidated against the cached copy of the endpoint */
+async function cachedRequest<T>(endpoint: string): Promise<T> {
+  const cached = responseCache.get(endpoint) as CachedResponse<T> | undefined;
+  const result = await conditionalRequest<T>(endpoint, cached?.etag);
+
+  if (result.notModified && cached) {
+    return cached.data;
+  }
+  if (result.data === undefined) {
+    // 304 without a cached copy: drop the validator and fetch again
+    responseCache.delete(endpoint);
+    return request<T>(endpoint);
+  }
+  if (result.etag) {
+    responseCache.set(endpoint, { etag: result.etag, data: result.data });
+  }
+  return result.data;
+}
+
 // ─── Auth API ────────────────────────────────────────────────────────
 
 /** POST /auth — returns { token } only */
@@ -239,7 +311,7 @@ export async function getProfileApi(): Promise<User> {
     return MOCK_USER;
   }
 
-  return request<User>(API_ENDPOINTS.PROFILE);
+  return cachedRequest<User>(API_ENDPOINTS.PROFILE);
 }
 
 /** POST /re-auth — refreshes token, returns { token } */
@@ -284,6 +356,8 @@ export async function uploadImageForAnalysis(
       message:
         "Anémie légère détectée, surveillance et consultation médicale conseillée",
       hb_level: "118.5 g/L",
+      hb_value: 118.5,
+      model_version: "mock",
       severity: "light",
       status: "anemia",
     };
@@ -321,14 +395,52 @@ export async function uploadImageForAnalysis(
   return response.json();
 }
 
-/** GET /histories — returns HistoryRecord[] */
+/**
+ * GET /histories — returns HistoryRecord[]
+ * Once a copy is cached, only entries since the newest one are fetched (?since=)
+ * and merged; a 304 reuses the cached list as is.
+ */
 export async function getAnalysisHistory(): Promise<HistoryRecord[]> {
   if (USE_MOCK_API) {
     await new Promise((resolve) => setTimeout(resolve, 600));
     return [...MOCK_HISTORY_RECORDS];
   }
 
-  return request<HistoryRecord[]>(API_ENDPOINTS.GET_HISTORY);
+  const endpoint = API_ENDPOINTS.GET_HISTORY;
+  const cached = responseCache.get(endpoint) as
+    | CachedResponse<HistoryRecord[]>
+    | undefined;
+  const newest = cached?.data[0]?.created_at;
+
+  if (!cached || !newest) {
+    return cachedRequest<HistoryRecord[]>(endpoint);
+  }
+
+  const delta = await conditionalRequest<HistoryRecord[]>(
+    `${endpoint}?since=${encodeURIComponent(newest)}`,
+    cached.etag,
+  );
+  if (delta.notModified) {
+    return cached.data;
+  }
+
+  // ?since= is inclusive: skip entries already cached
+  const known = new Set(cached.data.map((record) => record._id));
+  const merged = [
+    ...(delta.data ?? []).filter((record) => !known.has(record._id)),
+    ...cached.data,
+  ];
+
+  // Entries were removed elsewhere: the delta cannot be trusted, reload everything
+  if (delta.totalCount !== null && delta.totalCount !== merged.length) {
+    responseCache.delete(endpoint);
+    return cachedRequest<HistoryRecord[]>(endpoint);
+  }
+
+  if (delta.etag) {
+    responseCache.set(endpoint, { etag: delta.etag, data: merged });
+  }
+  return merged;
 }
 
 /** PUT /profile — update firstname/lastname */
@@ -341,6 +453,7 @@ export async function updateProfileApi(
     return { ...MOCK_USER, firstname, lastname };
   }
 
+  responseCache.delete(API_ENDPOINTS.PROFILE);
   return request<User>(API_ENDPOINTS.PROFILE, {
     method: "PUT",
     body: JSON.stringify({ firstname, lastname }),
@@ -380,6 +493,8 @@ export async function deleteHistoryApi(): Promise<{ message: string }> {
     return { message: "Historique supprimé" };
   }
 
+  responseCache.delete(API_ENDPOINTS.GET_HISTORY);
+  responseCache.delete(API_ENDPOINTS.PROFILE);
   return request<{ message: string }>(API_ENDPOINTS.DELETE_HISTORY, {
     method: "DELETE",
   });